@@ -1,90 +1,63 @@
 from __future__ import annotations
-from collections import defaultdict
 
 from . import xlineparse as _xlineparse  # type: ignore
 
-from dataclasses import dataclass, replace
+from dataclasses import dataclass, field, replace
 import enum
-import json
+import functools
+import itertools
+import mmap
+import os
+import stat
 from types import NoneType, UnionType
-from typing import Annotated, Any, Literal, Union, get_args, get_origin
+from typing import (
+    Annotated,
+    Any,
+    Callable,
+    Iterable,
+    Iterator,
+    Literal,
+    Sequence,
+    Union,
+    get_args,
+    get_origin,
+)
 import decimal
 
 
-@dataclass(frozen=True, kw_only=True)
+@dataclass(frozen=True, kw_only=True, slots=True)
 class StrField:
     required: bool = True
     min_length: int | None = None
     max_length: int | None = None
     invalid_characters: str | None = None
 
-    def as_dict(self) -> dict[str, Any]:
-        return dict(
-            kind="STR",
-            required=self.required,
-            min_length=self.min_length,
-            max_length=self.max_length,
-            invalid_characters=self.invalid_characters,
-        )
-
 
-@dataclass(frozen=True, kw_only=True)
+@dataclass(frozen=True, kw_only=True, slots=True)
 class StrEnumField:
     required: bool = True
     cls: type[enum.Enum]
 
-    def as_dict(self) -> dict[str, Any]:
-        values = {field.value for field in self.cls}
-        return dict(
-            kind="STR_ENUM",
-            required=self.required,
-            values=sorted(values),
-        )
-
 
-@dataclass(frozen=True, kw_only=True)
+@dataclass(frozen=True, kw_only=True, slots=True)
 class IntField:
     required: bool = True
     min_value: int | None = None
     max_value: int | None = None
 
-    def as_dict(self) -> dict[str, Any]:
-        return dict(
-            kind="INT",
-            required=self.required,
-            min_value=self.min_value,
-            max_value=self.max_value,
-        )
-
 
-@dataclass(frozen=True, kw_only=True)
+@dataclass(frozen=True, kw_only=True, slots=True)
 class IntEnumField:
     required: bool = True
     cls: type[enum.Enum]
 
-    def as_dict(self) -> dict[str, Any]:
-        values = {field.value for field in self.cls}
-        return dict(
-            kind="INT_ENUM",
-            required=self.required,
-            values=sorted(values),
-        )
-
 
-@dataclass(frozen=True, kw_only=True)
+@dataclass(frozen=True, kw_only=True, slots=True)
 class FloatField:
     required: bool = True
     min_value: float | None = None
     max_value: float | None = None
 
-    def as_dict(self) -> dict[str, Any]:
-        return dict(
-            kind="FLOAT",
-            required=self.required,
-            min_value=self.min_value,
-            max_value=self.max_value,
-        )
-
 
 def decimal_to_str(d: decimal.Decimal | None) -> str | None:
     if d is None:
@@ -92,78 +65,39 @@ def decimal_to_str(d: decimal.Decimal | None) -> str | None:
     return f"{d:f}"
 
 
-@dataclass(frozen=True, kw_only=True)
+@dataclass(frozen=True, kw_only=True, slots=True)
 class DecimalField:
     required: bool = True
     round_decimal_places: int | None = None
     min_value: decimal.Decimal | None = None
     max_value: decimal.Decimal | None = None
 
-    def as_dict(self) -> dict[str, Any]:
-        return dict(
-            kind="DECIMAL",
-            required=self.required,
-            round_decimal_places=self.round_decimal_places,
-            min_value=decimal_to_str(self.min_value),
-            max_value=decimal_to_str(self.max_value),
-        )
-
 
-@dataclass(frozen=True, kw_only=True)
+@dataclass(frozen=True, kw_only=True, slots=True)
 class BoolField:
     required: bool = True
     true_value: str
     false_value: str | None  # can only be "" if .required
 
-    def as_dict(self) -> dict[str, Any]:
-        return dict(
-            kind="BOOL",
-            required=self.required,
-            true_value=self.true_value,
-            false_value=self.false_value,
-        )
-
 
-@dataclass(frozen=True, kw_only=True)
+@dataclass(frozen=True, kw_only=True, slots=True)
 class DatetimeField:
     required: bool = True
     format: str
     time_zone: str  # eg: "UTC" | "Europe/London"
 
-    def as_dict(self) -> dict[str, Any]:
-        return dict(
-            kind="DATETIME",
-            required=self.required,
-            format=self.format,
-            time_zone=self.time_zone,
-        )
-
 
-@dataclass(frozen=True, kw_only=True)
+@dataclass(frozen=True, kw_only=True, slots=True)
 class DateField:
     required: bool = True
     format: str
 
-    def as_dict(self) -> dict[str, Any]:
-        return dict(
-            kind="DATE",
-            required=self.required,
-            format=self.format,
-        )
-
 
-@dataclass(frozen=True, kw_only=True)
+@dataclass(frozen=True, kw_only=True, slots=True)
 class TimeField:
     required: bool = True
     format: str
 
-    def as_dict(self) -> dict[str, Any]:
-        return dict(
-            kind="TIME",
-            required=self.required,
-            format=self.format,
-        )
-
 
 Field = (
     StrField
@@ -179,16 +113,83 @@ Field = (
 )
 
 
+def _encode_enum_field(kind: str, f: StrEnumField | IntEnumField) -> dict[str, Any]:
+    # Rust looks values up by position and hands back the matching member
+    value2member_map = f.cls._value2member_map_
+    values = sorted(value2member_map)
+    return dict(
+        kind=kind,
+        required=f.required,
+        values=values,
+        members=[value2member_map[v] for v in values],
+    )
+
+
+# How each field is handed to the Rust parser
+_ENCODE: dict[type[Any], Callable[[Any], dict[str, Any]]] = {
+    StrField: lambda f: dict(
+        kind="STR",
+        required=f.required,
+        min_length=f.min_length,
+        max_length=f.max_length,
+        invalid_characters=f.invalid_characters,
+    ),
+    StrEnumField: lambda f: _encode_enum_field("STR_ENUM", f),
+    IntField: lambda f: dict(
+        kind="INT",
+        required=f.required,
+        min_value=f.min_value,
+        max_value=f.max_value,
+    ),
+    IntEnumField: lambda f: _encode_enum_field("INT_ENUM", f),
+    FloatField: lambda f: dict(
+        kind="FLOAT",
+        required=f.required,
+        min_value=f.min_value,
+        max_value=f.max_value,
+    ),
+    DecimalField: lambda f: dict(
+        kind="DECIMAL",
+        required=f.required,
+        round_decimal_places=f.round_decimal_places,
+        min_value=decimal_to_str(f.min_value),
+        max_value=decimal_to_str(f.max_value),
+    ),
+    BoolField: lambda f: dict(
+        kind="BOOL",
+        required=f.required,
+        true_value=f.true_value,
+        false_value=f.false_value,
+    ),
+    DatetimeField: lambda f: dict(
+        kind="DATETIME",
+        required=f.required,
+        format=f.format,
+        time_zone=f.time_zone,
+    ),
+    DateField: lambda f: dict(kind="DATE", required=f.required, format=f.format),
+    TimeField: lambda f: dict(kind="TIME", required=f.required, format=f.format),
+}
+
+
+def _encode_field(f: Field) -> dict[str, Any]:
+    # Subclasses of the field classes are encoded as their base
+    for cls in type(f).__mro__:
+        if cls in _ENCODE:
+            return _ENCODE[cls](f)
+    raise TypeError(f"Unsupported field type: {type(f).__name__}")
+
+
+@functools.lru_cache(maxsize=None)
 def field_type_to_field(t: type) -> Field:
     field: Field | None = None
     required = True
     if get_origin(t) is Annotated:
         t, field = get_args(t)
     if get_origin(t) is Union or get_origin(t) is UnionType:
-        args = set(get_args(t))
-        assert len(args) == 2
-        args -= {None, NoneType}
-        (t,) = args
+        args = get_args(t)
+        assert len(args) == 2 and NoneType in args
+        t = args[1] if args[0] is NoneType else args[0]
         required = False
     # Once more in case the Union was nested
     if get_origin(t) is Annotated:
@@ -219,56 +220,81 @@ def field_type_to_field(t: type) -> Field:
     return field
 
 
-@dataclass(frozen=True, kw_only=True)
+@dataclass(frozen=True, kw_only=True, slots=True)
 class Line:
     name: str
-    fields: list[Field]
+    fields: Sequence[Field]  # stored as a tuple
 
-    def as_dict(self) -> dict[str, Any]:
-        return dict(
-            name=self.name,
-            fields=[field.as_dict() for field in self.fields],
-        )
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "fields", tuple(self.fields))
 
 
+@functools.lru_cache(maxsize=None)
 def convert_line_type(t: type) -> Line:
     assert get_origin(t) is tuple
     name_literal, *fields = get_args(t)
     assert get_origin(name_literal) is Literal
     name: str
     (name,) = get_args(name_literal)
-    return Line(name=name, fields=[field_type_to_field(t) for t in fields])
+    return Line(name=name, fields=tuple(field_type_to_field(t) for t in fields))
+
+
+# Raised from Rust, subclasses ValueError
+LineParseError: type[ValueError] = _xlineparse.LineParseError
 
 
-class LineParseError(ValueError): ...
+# Parsers are never freed on the Rust side, so reuse them where we can
+_PARSER_CACHE: dict[tuple[Any, ...], Any] = {}
 
 
-@dataclass(kw_only=True)
+@dataclass(frozen=True, kw_only=True)
 class Schema:
     delimiter: str
     quote_str: str | None = None
     trailing_delimiter: bool = False
     coerce_empty_quoted: bool = False  # convert '""': str|None -> '' instead of None
-    lines: list[Line]
+    cache_values: bool = True  # memoize repeated datetimes etc. in batch parses
+    lines: Sequence[Line]  # stored as a tuple
+    _parser: Any = field(init=False, repr=False, compare=False)
 
     def __post_init__(self) -> None:
-        # Add a ._parser
-        jsonable = dict(
-            delimiter=self.delimiter,
-            quote_str=self.quote_str,
-            trailing_delimiter=self.trailing_delimiter,
-            coerce_empty_quoted=self.coerce_empty_quoted,
-            lines=[line.as_dict() for line in self.lines],
-        )
-        self._parser = _xlineparse.Parser(json.dumps(jsonable))
-        # Set up enum conversion map, maybe there's a more efficient way of doing this..
-        self._enum_conversions: dict[str, dict[int, StrEnumField | IntEnumField]] = (
-            defaultdict(dict)
+        object.__setattr__(self, "lines", tuple(self.lines))
+        # Add a ._parser, identical schemas share one. Fields are frozen
+        # dataclasses so hash, enum fields by their class
+        key = (
+            self.delimiter,
+            self.quote_str,
+            self.trailing_delimiter,
+            self.coerce_empty_quoted,
+            self.cache_values,
+            tuple((line.name, line.fields) for line in self.lines),
         )
-        for line in self.lines:
-            for i, field in enumerate(line.fields, start=1):
-                if isinstance(field, (StrEnumField, IntEnumField)):
-                    self._enum_conversions[line.name][i] = field
+        parser = _PARSER_CACHE.get(key)
+        if parser is None:
+            parser = _PARSER_CACHE.setdefault(
+                key,
+                _xlineparse.Parser(
+                    self.delimiter,
+                    self.quote_str,
+                    self.trailing_delimiter,
+                    self.coerce_empty_quoted,
+                    self.cache_values,
+                    [
+                        dict(
+                            name=line.name,
+                            fields=[_encode_field(f) for f in line.fields],
+                        )
+                        for line in self.lines
+                    ],
+                ),
+            )
+        object.__setattr__(self, "_parser", parser)
+        # Nothing is left to do in Python per line, so skip the wrapper frame,
+        # unless a subclass has overridden it
+        if type(self).parse_line is Schema.parse_line:
+            object.__setattr__(self, "parse_line", parser.parse_line)
+        if type(self).parse_many is Schema.parse_many:
+            object.__setattr__(self, "parse_many", parser.parse_many)
 
     @staticmethod
     def from_type(
@@ -277,37 +303,94 @@ class Schema:
         quote_str: str | None = None,  # do we quote strings like "foo"
         trailing_delimiter: bool = False,
         coerce_empty_quoted: bool = False,
+        cache_values: bool = True,
         t: Any,  # some day, we can use TypeForm here...
     ) -> Schema:
-        if get_origin(t) is Union or get_origin(t) is UnionType:
-            lines = [convert_line_type(arg) for arg in get_args(t)]
-        else:
-            lines = [convert_line_type(t)]
-        return Schema(
-            delimiter=delimiter,
-            quote_str=quote_str,
-            trailing_delimiter=trailing_delimiter,
-            coerce_empty_quoted=coerce_empty_quoted,
-            lines=lines,
+        # A | B == B | A, so key the cache on the ordered line types
+        origin = get_origin(t)
+        line_types = get_args(t) if origin is Union or origin is UnionType else (t,)
+        return _build_schema(
+            delimiter,
+            quote_str,
+            trailing_delimiter,
+            coerce_empty_quoted,
+            cache_values,
+            line_types,
         )
 
-    def parse_line(self, line: str) -> tuple[Any, ...]:
-        try:
-            parsed = self._parser.parse_line(line)
-        except ValueError as e:
-            line = line.rstrip("\n")
-            raise LineParseError(f"Failed to parse line: '{line}'\n {e.args[0]}")
-        if self._enum_conversions:
-            enum_conversion: dict[int, StrEnumField | IntEnumField] = (
-                self._enum_conversions[parsed[0]]
-            )
-            parsed_mut = list(parsed)
-            for i, converter in enum_conversion.items():
-                v = parsed_mut[i]
-                if v is not None:
-                    parsed_mut[i] = converter.cls._value2member_map_[v]
-            parsed = tuple(parsed_mut)
-        return parsed  # type: ignore
-
-    def parse_first(self, line: str) -> str:
+    def parse_line(self, line: str | bytes) -> tuple[Any, ...]:
+        return self._parser.parse_line(line)  # type: ignore
+
+    def parse_many(self, lines: list[str]) -> list[tuple[Any, ...]]:
+        return self._parser.parse_many(lines)  # type: ignore
+
+    # With parallel=True, num_threads=0 uses every core
+    def parse_buffer(
+        self,
+        data: bytes,
+        *,
+        newline: bytes = b"\n",
+        parallel: bool = False,
+        num_threads: int = 0,
+    ) -> list[tuple[Any, ...]]:
+        n = num_threads if parallel else 1
+        return self._parser.parse_buffer(data, newline, n)  # type: ignore
+
+    def parse_columns(
+        self,
+        data: bytes,
+        *,
+        newline: bytes = b"\n",
+        parallel: bool = False,
+        num_threads: int = 0,
+    ) -> dict[str, tuple[list[Any], ...]]:
+        n = num_threads if parallel else 1
+        return self._parser.parse_columns(data, newline, n)  # type: ignore
+
+    def parse_file(
+        self,
+        path: str | os.PathLike[str],
+        *,
+        newline: bytes = b"\n",
+        parallel: bool = False,
+        num_threads: int = 0,
+    ) -> list[tuple[Any, ...]]:
+        n = num_threads if parallel else 1
+        with open(path, "rb") as f:
+            st = os.fstat(f.fileno())
+            # Pipes can't be mapped, nor can empty files. /proc files are
+            # regular but report a size of 0, so read those too
+            if not stat.S_ISREG(st.st_mode) or st.st_size == 0:
+                return self._parser.parse_buffer(f.read(), newline, n)  # type: ignore
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                return self._parser.parse_buffer(m, newline, n)  # type: ignore
+
+    def parse_lines(
+        self, lines: Iterable[str], *, chunk_size: int = 10_000
+    ) -> Iterator[tuple[Any, ...]]:
+        it = iter(lines)
+        while chunk := list(itertools.islice(it, chunk_size)):
+            yield from self._parser.parse_many(chunk)
+
+    def parse_first(self, line: str | bytes) -> str:
         return self._parser.parse_first(line)  # type: ignore
+
+
+@functools.lru_cache(maxsize=256)
+def _build_schema(
+    delimiter: str,
+    quote_str: str | None,
+    trailing_delimiter: bool,
+    coerce_empty_quoted: bool,
+    cache_values: bool,
+    line_types: tuple[Any, ...],
+) -> Schema:
+    lines = tuple(convert_line_type(t) for t in line_types)
+    return Schema(
+        delimiter=delimiter,
+        quote_str=quote_str,
+        trailing_delimiter=trailing_delimiter,
+        coerce_empty_quoted=coerce_empty_quoted,
+        cache_values=cache_values,
+        lines=lines,
+    )
@@ -2,49 +2,63 @@
 
 extern crate chrono;
 extern crate chrono_tz;
+extern crate memchr;
 extern crate pyo3;
 extern crate rust_decimal;
-extern crate serde;
-extern crate serde_json;
 
 use chrono::offset::LocalResult;
 use chrono::Datelike;
+use chrono::Offset;
 use chrono::Timelike;
+use pyo3::buffer::PyBuffer;
+use pyo3::create_exception;
 use pyo3::exceptions::*;
+use pyo3::ffi;
 use pyo3::prelude::*;
 use pyo3::types::*;
 
-use chrono::{NaiveDate, NaiveDateTime, NaiveTime, TimeZone};
+use chrono::{DateTime, NaiveDate, NaiveDateTime, NaiveTime, TimeZone};
 use chrono_tz::Tz;
 use rust_decimal::Decimal;
-use serde::{Deserialize, Serialize};
+use std::collections::HashMap;
 
-// For now, we serialize schemas as JSON, maybe in the future we can use:
-// https://crates.io/crates/pythonize
-#[derive(Debug, Deserialize, Serialize)]
-#[serde(tag = "kind")]
+create_exception!(xlineparse, LineParseError, PyValueError);
+
+// Schemas come over from Python as dicts, see `_ENCODE`
+#[derive(Debug)]
 enum Field {
-    #[serde(rename = "STR")]
     Str(StrField),
-    #[serde(rename = "STR_ENUM")]
     StrEnum(StrEnumField),
-    #[serde(rename = "INT")]
     Int(IntField),
-    #[serde(rename = "INT_ENUM")]
     IntEnum(IntEnumField),
-    #[serde(rename = "FLOAT")]
     Float(FloatField),
-    #[serde(rename = "DECIMAL")]
     Decimal(DecimalField),
-    #[serde(rename = "BOOL")]
     Bool(BoolField),
-    #[serde(rename = "DATETIME")]
     Datetime(DatetimeField),
-    #[serde(rename = "DATE")]
     Date(DateField),
-    #[serde(rename = "TIME")]
     Time(TimeField),
 }
+impl<'source> FromPyObject<'source> for Field {
+    fn extract(ob: &'source PyAny) -> PyResult<Self> {
+        let kind: &str = ob.get_item("kind")?.extract()?;
+        match kind {
+            "STR" => Ok(Field::Str(ob.extract()?)),
+            "STR_ENUM" => Ok(Field::StrEnum(ob.extract()?)),
+            "INT" => Ok(Field::Int(ob.extract()?)),
+            "INT_ENUM" => Ok(Field::IntEnum(ob.extract()?)),
+            "FLOAT" => Ok(Field::Float(ob.extract()?)),
+            "DECIMAL" => Ok(Field::Decimal(ob.extract()?)),
+            "BOOL" => Ok(Field::Bool(ob.extract()?)),
+            "DATETIME" => Ok(Field::Datetime(ob.extract()?)),
+            "DATE" => Ok(Field::Date(ob.extract()?)),
+            "TIME" => Ok(Field::Time(ob.extract()?)),
+            _ => Err(PyValueError::new_err(format!(
+                "Unknown field kind '{}'",
+                kind
+            ))),
+        }
+    }
+}
 impl Field {
     fn is_str(&self) -> bool {
         match self {
@@ -52,92 +66,370 @@ impl Field {
             _ => false,
         }
     }
+    // Slow to parse, and in practice the same values come up again and again
+    // (or rounding collapses them together)
+    fn is_cached(&self) -> bool {
+        match self {
+            Field::Datetime(_) | Field::Date(_) | Field::Time(_) => true,
+            Field::Decimal(DecimalField {
+                round_decimal_places,
+                ..
+            }) => round_decimal_places.is_some(),
+            _ => false,
+        }
+    }
 }
 
-#[derive(Debug, Deserialize, Serialize)]
 struct StrField {
     required: bool,
     min_length: Option<usize>,
     max_length: Option<usize>,
-    invalid_characters: Option<String>,
+    invalid_characters: Option<CharSet>,
+    // min_length..=max_length as (min, max - min), so a length is in range if
+    // length.wrapping_sub(min) <= max - min, a single compare
+    length_range: Option<(usize, usize)>,
+}
+impl<'source> FromPyObject<'source> for StrField {
+    fn extract(ob: &'source PyAny) -> PyResult<Self> {
+        let min_length: Option<usize> = ob.get_item("min_length")?.extract()?;
+        let max_length: Option<usize> = ob.get_item("max_length")?.extract()?;
+        let length_range = match (min_length, max_length) {
+            (None, None) => None,
+            (min, max) => {
+                // min_length > max_length is rejected by Parser::new, errors
+                // raised here would be rewrapped as a TypeError
+                let min = min.unwrap_or(0);
+                Some((min, max.unwrap_or(usize::MAX).saturating_sub(min)))
+            }
+        };
+        Ok(StrField {
+            required: ob.get_item("required")?.extract()?,
+            min_length: min_length,
+            max_length: max_length,
+            invalid_characters: ob.get_item("invalid_characters")?.extract()?,
+            length_range: length_range,
+        })
+    }
+}
+impl std::fmt::Debug for StrField {
+    fn fmt(&self, f: &mut std::fmt::Formatter) -> std::fmt::Result {
+        f.debug_struct("StrField")
+            .field("required", &self.required)
+            .field("min_length", &self.min_length)
+            .field("max_length", &self.max_length)
+            .field("invalid_characters", &self.invalid_characters)
+            .finish()
+    }
+}
+
+// Compiled to a bitset for ASCII, other chars are checked one by one
+struct CharSet {
+    raw: String,
+    ascii: [u64; 2],
+    non_ascii: Vec<char>,
+}
+impl<'source> FromPyObject<'source> for CharSet {
+    fn extract(ob: &'source PyAny) -> PyResult<Self> {
+        let raw: String = ob.extract()?;
+        let mut ascii = [0u64; 2];
+        let mut non_ascii = vec![];
+        for c in raw.chars() {
+            if c.is_ascii() {
+                ascii[c as usize >> 6] |= 1 << (c as u32 & 63);
+            } else {
+                non_ascii.push(c);
+            }
+        }
+        Ok(CharSet {
+            raw: raw,
+            ascii: ascii,
+            non_ascii: non_ascii,
+        })
+    }
+}
+impl std::fmt::Debug for CharSet {
+    fn fmt(&self, f: &mut std::fmt::Formatter) -> std::fmt::Result {
+        self.raw.fmt(f)
+    }
+}
+impl CharSet {
+    fn contains_ascii(&self, b: u8) -> bool {
+        (self.ascii[b as usize >> 6] >> (b & 63)) & 1 == 1
+    }
+    fn contains_any(&self, value: &str) -> bool {
+        if self.non_ascii.is_empty() {
+            // Bytes of multi-byte chars are all >= 128, so can be skipped
+            value.bytes().any(|b| b < 128 && self.contains_ascii(b))
+        } else {
+            value.chars().any(|c| {
+                if c.is_ascii() {
+                    self.contains_ascii(c as u8)
+                } else {
+                    self.non_ascii.contains(&c)
+                }
+            })
+        }
+    }
 }
 
-#[derive(Debug, Deserialize, Serialize)]
+#[derive(FromPyObject)]
 struct StrEnumField {
+    #[pyo3(item)]
     required: bool,
+    // Sorted, members[i] is the Enum member for values[i]
+    #[pyo3(item)]
     values: Vec<String>,
+    #[pyo3(item)]
+    members: Vec<PyObject>,
+}
+// Shown in error messages, members would only print as pointers
+impl std::fmt::Debug for StrEnumField {
+    fn fmt(&self, f: &mut std::fmt::Formatter) -> std::fmt::Result {
+        f.debug_struct("StrEnumField")
+            .field("required", &self.required)
+            .field("values", &self.values)
+            .finish()
+    }
 }
 
-#[derive(Debug, Deserialize, Serialize)]
+#[derive(Debug, FromPyObject)]
 struct IntField {
+    #[pyo3(item)]
     required: bool,
     // We use f64 here so we can represent large numbers, bit naughty
+    #[pyo3(item)]
     min_value: Option<f64>,
+    #[pyo3(item)]
     max_value: Option<f64>,
 }
 
-#[derive(Debug, Deserialize, Serialize)]
 struct IntEnumField {
     required: bool,
+    // Sorted, members[i] is the Enum member for values[i]
     values: Vec<i64>,
+    members: Vec<PyObject>,
+    // Values are unique, so if they're contiguous (eg: 1, 2, 3) the index of
+    // i is i - lo
+    contiguous_lo: Option<i64>,
+}
+impl<'source> FromPyObject<'source> for IntEnumField {
+    fn extract(ob: &'source PyAny) -> PyResult<Self> {
+        let values: Vec<i64> = ob.get_item("values")?.extract()?;
+        let contiguous_lo = match (values.first(), values.last()) {
+            (Some(&lo), Some(&hi)) if hi.checked_sub(lo) == Some(values.len() as i64 - 1) => {
+                Some(lo)
+            }
+            _ => None,
+        };
+        Ok(IntEnumField {
+            required: ob.get_item("required")?.extract()?,
+            values: values,
+            members: ob.get_item("members")?.extract()?,
+            contiguous_lo: contiguous_lo,
+        })
+    }
+}
+impl std::fmt::Debug for IntEnumField {
+    fn fmt(&self, f: &mut std::fmt::Formatter) -> std::fmt::Result {
+        f.debug_struct("IntEnumField")
+            .field("required", &self.required)
+            .field("values", &self.values)
+            .finish()
+    }
 }
 
-#[derive(Debug, Deserialize, Serialize)]
+#[derive(Debug, FromPyObject)]
 struct FloatField {
+    #[pyo3(item)]
     required: bool,
+    #[pyo3(item)]
     min_value: Option<f64>,
+    #[pyo3(item)]
     max_value: Option<f64>,
 }
 
-#[derive(Debug, Deserialize, Serialize)]
+#[derive(Debug, FromPyObject)]
 struct DecimalField {
+    #[pyo3(item)]
     required: bool,
+    #[pyo3(item)]
     round_decimal_places: Option<u32>,
+    #[pyo3(item)]
     min_value: Option<Decimal>,
+    #[pyo3(item)]
     max_value: Option<Decimal>,
 }
 
-#[derive(Debug, Deserialize, Serialize)]
+#[derive(Debug, FromPyObject)]
 struct BoolField {
+    #[pyo3(item)]
     required: bool,
-    true_value: String,
-    false_value: Option<String>,
+    #[pyo3(item)]
+    true_value: BoolValue,
+    #[pyo3(item)]
+    false_value: Option<BoolValue>,
+}
+
+// Values of up to 8 bytes are compared as a single u64
+struct BoolValue {
+    raw: String,
+    word: Option<u64>,
+}
+impl<'source> FromPyObject<'source> for BoolValue {
+    fn extract(ob: &'source PyAny) -> PyResult<Self> {
+        let raw: String = ob.extract()?;
+        let word = if raw.len() <= 8 {
+            Some(to_word(raw.as_bytes()))
+        } else {
+            None
+        };
+        Ok(BoolValue {
+            raw: raw,
+            word: word,
+        })
+    }
+}
+impl std::fmt::Debug for BoolValue {
+    fn fmt(&self, f: &mut std::fmt::Formatter) -> std::fmt::Result {
+        self.raw.fmt(f)
+    }
+}
+impl BoolValue {
+    fn equals(&self, b: &[u8]) -> bool {
+        match self.word {
+            Some(word) => b.len() == self.raw.len() && to_word(b) == word,
+            None => self.raw.as_bytes() == b,
+        }
+    }
+    // We allow 'Y' to pass as the bool '"Y"'
+    fn matches(&self, value: &str, quote_char: Option<u8>) -> bool {
+        let raw = self.raw.as_bytes();
+        self.equals(value.as_bytes())
+            || quote_char.map_or(false, |q| {
+                raw.len() == value.len() + 2
+                    && raw[0] == q
+                    && raw[raw.len() - 1] == q
+                    && &raw[1..raw.len() - 1] == value.as_bytes()
+            })
+    }
+}
+
+fn to_word(b: &[u8]) -> u64 {
+    let mut word = [0u8; 8];
+    word[..b.len()].copy_from_slice(b);
+    u64::from_le_bytes(word)
 }
 
-#[derive(Debug, Deserialize, Serialize)]
+#[derive(Debug, FromPyObject)]
 struct DatetimeField {
+    #[pyo3(item)]
     required: bool,
-    format: String,
-    time_zone: String,
+    #[pyo3(item)]
+    format: Format,
+    #[pyo3(item)]
+    time_zone: TimeZoneName,
 }
 
-#[derive(Debug, Deserialize, Serialize)]
+// Looked up once when the schema is built, an unknown name only errors when
+// a value is parsed
+struct TimeZoneName {
+    raw: String,
+    tz: Option<Tz>,
+}
+impl<'source> FromPyObject<'source> for TimeZoneName {
+    fn extract(ob: &'source PyAny) -> PyResult<Self> {
+        let raw: String = ob.extract()?;
+        let tz = raw.parse().ok();
+        Ok(TimeZoneName { raw: raw, tz: tz })
+    }
+}
+impl std::fmt::Debug for TimeZoneName {
+    fn fmt(&self, f: &mut std::fmt::Formatter) -> std::fmt::Result {
+        self.raw.fmt(f)
+    }
+}
+
+#[derive(Debug, FromPyObject)]
 struct DateField {
+    #[pyo3(item)]
     required: bool,
-    format: String,
+    #[pyo3(item)]
+    format: Format,
 }
 
-#[derive(Debug, Deserialize, Serialize)]
+#[derive(Debug, FromPyObject)]
 struct TimeField {
+    #[pyo3(item)]
     required: bool,
-    format: String,
+    #[pyo3(item)]
+    format: Format,
 }
 
-#[derive(Debug, Deserialize, Serialize)]
+// Formats are resolved once when the schema is built, the common fixed width
+// ones skip chrono's format parser
+struct Format {
+    raw: String,
+    fixed: Option<FixedFormat>,
+}
+impl<'source> FromPyObject<'source> for Format {
+    fn extract(ob: &'source PyAny) -> PyResult<Self> {
+        let raw: String = ob.extract()?;
+        let fixed = match raw.as_str() {
+            "%Y-%m-%d" => Some(FixedFormat::Date),
+            "%Y%m%d" => Some(FixedFormat::DateCompact),
+            "%H:%M:%S" => Some(FixedFormat::Time),
+            "%H%M%S" => Some(FixedFormat::TimeCompact),
+            "%Y-%m-%d %H:%M:%S" => Some(FixedFormat::Datetime(b' ')),
+            "%Y-%m-%dT%H:%M:%S" => Some(FixedFormat::Datetime(b'T')),
+            _ => None,
+        };
+        Ok(Format {
+            raw: raw,
+            fixed: fixed,
+        })
+    }
+}
+impl std::fmt::Debug for Format {
+    fn fmt(&self, f: &mut std::fmt::Formatter) -> std::fmt::Result {
+        self.raw.fmt(f)
+    }
+}
+
+#[derive(Debug, Clone, Copy)]
+enum FixedFormat {
+    Date,         // %Y-%m-%d
+    DateCompact,  // %Y%m%d
+    Time,         // %H:%M:%S
+    TimeCompact,  // %H%M%S
+    Datetime(u8), // %Y-%m-%d?%H:%M:%S, the separator is ' ' or 'T'
+}
+
+#[derive(Debug, FromPyObject)]
 struct Line {
+    #[pyo3(item)]
     name: String,
+    #[pyo3(item)]
     fields: Vec<Field>,
 }
 
-#[derive(Debug, Deserialize, Serialize)]
+#[derive(Debug)]
 pub struct Schema {
-    delimiter: String,
-    quote_str: Option<String>,
+    // Checked to be a single byte when the schema is built, so lines can be
+    // scanned bytewise
+    delimiter: u8,
+    quote_char: Option<u8>,
     trailing_delimiter: bool,
     coerce_empty_quoted: bool,
+    cache_values: bool,
     lines: Vec<Line>,
+    // Line name -> index into lines
+    line_indexes: HashMap<String, usize>,
+    // Interned, so every row shares the one Python str
+    line_names: Vec<PyObject>,
 }
 
+const ALLOW_THREADS_MIN_LEN: usize = 4096;
+
 #[pyclass(frozen, module = "xlineparse")]
 pub struct Parser {
     // Schema lives for the duration of the program
@@ -146,117 +438,512 @@ pub struct Parser {
 #[pymethods]
 impl Parser {
     #[new]
-    fn new<'a>(_py: Python<'a>, schema_json_str: &str) -> PyResult<Self> {
-        let parsed_data: serde_json::Result<Schema> = serde_json::from_str(schema_json_str);
-        match parsed_data {
-            Ok(schemas) => {
-                // Schema lives for the duration of the program
-                let boxed = Box::new(schemas);
-                let leaked = Box::leak(boxed);
-                Ok(Parser { schema: leaked })
+    fn new<'a>(
+        _py: Python<'a>,
+        delimiter: String,
+        quote_str: Option<String>,
+        trailing_delimiter: bool,
+        coerce_empty_quoted: bool,
+        cache_values: bool,
+        lines: Vec<Line>,
+    ) -> PyResult<Self> {
+        for field in lines.iter().flat_map(|line| &line.fields) {
+            if let Field::Str(StrField {
+                min_length: Some(min),
+                max_length: Some(max),
+                ..
+            }) = *field
+            {
+                if min > max {
+                    return Err(LineParseError::new_err(
+                        "min_length is greater than max_length",
+                    ));
+                }
             }
-            Err(e) => Err(PyValueError::new_err(e.to_string())),
         }
+        let mut line_indexes = HashMap::with_capacity(lines.len());
+        for (i, line) in lines.iter().enumerate() {
+            // The first line with a given name wins
+            line_indexes.entry(line.name.clone()).or_insert(i);
+        }
+        let line_names = lines
+            .iter()
+            .map(|line| PyString::intern(_py, &line.name).into_py(_py))
+            .collect();
+        let schema = Schema {
+            delimiter: single_byte(&delimiter, "Delimiter")?,
+            quote_char: quote_str
+                .map(|quote_str| single_byte(&quote_str, "Quote"))
+                .transpose()?,
+            trailing_delimiter: trailing_delimiter,
+            coerce_empty_quoted: coerce_empty_quoted,
+            cache_values: cache_values,
+            lines: lines,
+            line_indexes: line_indexes,
+            line_names: line_names,
+        };
+        // Schema lives for the duration of the program
+        let boxed = Box::new(schema);
+        let leaked = Box::leak(boxed);
+        Ok(Parser { schema: leaked })
     }
-    fn parse_line<'a>(&self, _py: Python<'a>, line: &str) -> PyResult<PyObject> {
-        let delimiter = if self.schema.delimiter.len() == 1 {
-            Ok(self.schema.delimiter.chars().next().unwrap())
+    fn parse_line<'a>(&self, _py: Python<'a>, line: LineInput) -> PyResult<PyObject> {
+        let line = line.as_str()?;
+        // A cache isn't worth setting up for a single line. Dropping and
+        // retaking the GIL is a fixed cost on the order of parsing a short
+        // line, so only bother for long ones
+        let parse = || self.parse(line, &mut ValueCache::new(false));
+        let row = if line.len() >= ALLOW_THREADS_MIN_LEN {
+            _py.allow_threads(parse)
         } else {
-            Err(PyValueError::new_err("Delimiter needs to be of length 1"))
-        }?;
+            parse()
+        };
+        let row = row.map_err(|e| line_parse_error(line, e))?;
+        row.to_object(_py, &mut ObjectCache::new(false))
+    }
+    fn parse_many<'a>(&self, _py: Python<'a>, lines: Vec<&str>) -> PyResult<PyObject> {
+        // Only take the GIL back to build the Python objects
+        let rows = _py.allow_threads(|| {
+            let mut cache = ValueCache::new(self.schema.cache_values);
+            lines
+                .iter()
+                .map(|line| {
+                    self.parse(line, &mut cache)
+                        .map_err(|e| line_parse_error(line, e))
+                })
+                .collect::<PyResult<Vec<Row>>>()
+        })?;
+        self.rows_into_py(_py, rows)
+    }
+    fn parse_buffer<'a>(
+        &self,
+        _py: Python<'a>,
+        data: PyBuffer<u8>,
+        newline: &[u8],
+        num_threads: usize,
+    ) -> PyResult<PyObject> {
+        let rows = self.parse_data(_py, data, newline, num_threads)?;
+        self.rows_into_py(_py, rows)
+    }
+    fn parse_columns<'a>(
+        &self,
+        _py: Python<'a>,
+        data: PyBuffer<u8>,
+        newline: &[u8],
+        num_threads: usize,
+    ) -> PyResult<PyObject> {
+        let rows = self.parse_data(_py, data, newline, num_threads)?;
+        self.rows_into_columns(_py, rows)
+    }
+    fn parse_first<'a>(&self, _py: Python<'a>, line: LineInput) -> PyResult<PyObject> {
+        let line = line.as_str()?;
+        if let Some(quote_char) = self.schema.quote_char {
+            if line.as_bytes().first() == Some(&quote_char) {
+                let rest = &line[1..];
+                let end = memchr::memchr(quote_char, rest.as_bytes()).unwrap_or(rest.len());
+                return str_to_py(_py, &rest[..end]);
+            }
+        };
+        let end = memchr::memchr(self.schema.delimiter, line.as_bytes()).unwrap_or(line.len());
+        return str_to_py(_py, &line[..end]);
+    }
+}
 
-        let quote_char = if let Some(quote_str) = &self.schema.quote_str {
-            if quote_str.len() == 1 {
-                Ok(Some(quote_str.chars().next().unwrap()))
+impl Parser {
+    fn parse_data<'a>(
+        &self,
+        _py: Python<'a>,
+        data: PyBuffer<u8>,
+        newline: &[u8],
+        num_threads: usize,
+    ) -> PyResult<Vec<Row>> {
+        if newline.len() != 1 {
+            return Err(LineParseError::new_err("Newline must be a single byte"));
+        }
+        let data = buffer_bytes(&data)?;
+        _py.allow_threads(|| {
+            if num_threads == 1 {
+                self.parse_bytes(data, newline[0])
             } else {
-                Err(PyValueError::new_err("Quote needs to be of length 1"))
-            }?
-        } else {
-            None
-        };
+                self.parse_bytes_parallel(data, newline[0], num_threads)
+            }
+        })
+    }
+    fn rows_into_py<'a>(&self, _py: Python<'a>, rows: Vec<Row>) -> PyResult<PyObject> {
+        let mut objects = ObjectCache::new(self.schema.cache_values);
+        let items = rows
+            .into_iter()
+            .map(|row| row.to_object(_py, &mut objects))
+            .collect::<PyResult<Vec<PyObject>>>()?;
+        Ok(PyList::new(_py, items).into_py(_py))
+    }
+    // {line name: (column, ...)}, every line in the schema gets an entry
+    fn rows_into_columns<'a>(&self, _py: Python<'a>, rows: Vec<Row>) -> PyResult<PyObject> {
+        let lines = &self.schema.lines;
+        let mut objects = ObjectCache::new(self.schema.cache_values);
+        let mut columns: Vec<Vec<Vec<PyObject>>> = lines
+            .iter()
+            .map(|line| line.fields.iter().map(|_| vec![]).collect())
+            .collect();
+        for row in rows {
+            for (column, value) in columns[row.line_index].iter_mut().zip(row.values) {
+                column.push(value.to_object(_py, &mut objects)?);
+            }
+        }
+        let out = PyDict::new(_py);
+        for (i, line_columns) in columns.into_iter().enumerate() {
+            // Lines shadowed by an earlier one of the same name never match
+            if self.schema.line_indexes[&lines[i].name] != i {
+                continue;
+            }
+            let line_columns = line_columns.into_iter().map(|c| PyList::new(_py, c));
+            out.set_item(&self.schema.line_names[i], PyTuple::new(_py, line_columns))?;
+        }
+        Ok(out.into_py(_py))
+    }
+    fn parse(&self, line: &str, cache: &mut ValueCache) -> Result<Row, String> {
+        let schema: &'static Schema = self.schema;
+        let quote_char = schema.quote_char;
 
         let mut line_stripped = line.trim_end_matches('\n');
-        if self.schema.trailing_delimiter {
-            line_stripped = if line_stripped.ends_with(delimiter) {
+        if schema.trailing_delimiter {
+            line_stripped = if line_stripped.as_bytes().last() == Some(&schema.delimiter) {
                 Ok(&line_stripped[..line_stripped.len() - 1])
             } else {
-                Err(PyValueError::new_err(
-                    "Line doesn't have trailing delimiter",
-                ))
+                Err("Line doesn't have trailing delimiter")
             }?;
         };
-        let parts = split_line(line_stripped, delimiter, quote_char);
+        let parts = split_line(line_stripped, schema.delimiter, quote_char);
 
-        let first = parts
-            .get(0)
-            .ok_or(PyValueError::new_err("Split line has length < 1"))?;
+        let first = parts.get(0).ok_or("Split line has length < 1")?;
 
-        let schema_line = self
-            .schema
-            .lines
-            .iter()
-            .find(|schema_line| schema_line.name == first.value)
-            .ok_or_else(|| {
-                PyValueError::new_err(format!("No schema line matching '{}'", first.value))
-            })?;
+        let line_index = *schema
+            .line_indexes
+            .get(first.as_str())
+            .ok_or_else(|| format!("No schema line matching '{}'", first.value))?;
+        let schema_line = &schema.lines[line_index];
 
         if schema_line.fields.len() != parts.len() - 1 {
-            return Err(PyValueError::new_err(format!(
+            return Err(format!(
                 "Mismatched line length, schema length: {}, actual length: (header=1) + {}",
                 schema_line.fields.len(),
                 parts.len() - 1
-            )));
+            ));
         }
 
-        let mut py_items: Vec<PyObject> = vec![first.value.clone().into_py(_py)];
+        let mut values: Vec<Value> = Vec::with_capacity(schema_line.fields.len());
         for (schema_field, part) in schema_line.fields.iter().zip(parts.iter().skip(1)) {
-            py_items.push(part_to_py(
-                _py,
-                self.schema.coerce_empty_quoted,
-                quote_char,
-                schema_field,
-                part,
-            )?)
-        }
-        Ok(PyTuple::new(_py, &py_items).into_py(_py))
-    }
-    fn parse_first<'a>(&self, _py: Python<'a>, line: &str) -> PyResult<PyObject> {
-        let quote_char = if let Some(quote_str) = &self.schema.quote_str {
-            if quote_str.len() == 1 {
-                Ok(Some(quote_str.chars().next().unwrap()))
-            } else {
-                Err(PyValueError::new_err("Quote needs to be of length 1"))
-            }?
+            values.push(cache.get_or_insert(schema_field, part.as_str(), || {
+                part_to_value(schema.coerce_empty_quoted, quote_char, schema_field, part)
+            })?)
+        }
+        Ok(Row {
+            line_index: line_index,
+            name: &schema.line_names[line_index],
+            values: values,
+        })
+    }
+    fn parse_bytes(&self, data: &[u8], newline: u8) -> PyResult<Vec<Row>> {
+        let mut rows: Vec<Row> = vec![];
+        let mut cache = ValueCache::new(self.schema.cache_values);
+        let mut start = 0;
+        // A trailing newline doesn't start another line
+        while start < data.len() {
+            let end = memchr::memchr(newline, &data[start..]).map_or(data.len(), |i| start + i);
+            let line_bytes = &data[start..end];
+            let line = std::str::from_utf8(line_bytes).map_err(|e| {
+                line_parse_error(&String::from_utf8_lossy(line_bytes), e.to_string())
+            })?;
+            rows.push(
+                self.parse(line, &mut cache)
+                    .map_err(|e| line_parse_error(line, e))?,
+            );
+            start = end + 1;
+        }
+        Ok(rows)
+    }
+    // num_threads=0 uses every core
+    fn parse_bytes_parallel(
+        &self,
+        data: &[u8],
+        newline: u8,
+        num_threads: usize,
+    ) -> PyResult<Vec<Row>> {
+        let n_threads = if num_threads == 0 {
+            std::thread::available_parallelism().map_or(1, |n| n.get())
         } else {
-            None
+            num_threads
         };
-        if quote_char.is_some() && line.starts_with(quote_char.unwrap()) {
-            let mut out = String::new();
-            for ch in line.chars().skip(1) {
-                if ch == quote_char.unwrap() {
-                    break;
-                }
-                out.push(ch)
+        let chunk_size = data.len() / n_threads + 1;
+        // Each chunk ends just after a newline, so no line is split
+        let mut chunks: Vec<&[u8]> = vec![];
+        let mut start = 0;
+        while start < data.len() {
+            let end = if start + chunk_size >= data.len() {
+                data.len()
+            } else {
+                memchr::memchr(newline, &data[start + chunk_size..])
+                    .map_or(data.len(), |i| start + chunk_size + i + 1)
+            };
+            chunks.push(&data[start..end]);
+            start = end;
+        }
+        std::thread::scope(|s| {
+            let handles: Vec<_> = chunks
+                .into_iter()
+                .map(|chunk| s.spawn(move || self.parse_bytes(chunk, newline)))
+                .collect();
+            let mut rows: Vec<Row> = vec![];
+            for handle in handles {
+                rows.extend(handle.join().unwrap()?);
             }
-            return Ok(out.into_py(_py));
-        };
+            Ok(rows)
+        })
+    }
+}
+
+// A line is a str, or anything exposing a buffer (bytes, memoryview, ...)
+#[derive(FromPyObject)]
+enum LineInput<'a> {
+    Str(&'a str),
+    Buffer(PyBuffer<u8>),
+}
+impl<'a> LineInput<'a> {
+    fn as_str(&self) -> PyResult<&str> {
+        match self {
+            LineInput::Str(line) => Ok(line),
+            LineInput::Buffer(buffer) => {
+                let bytes = buffer_bytes(buffer)?;
+                std::str::from_utf8(bytes)
+                    .map_err(|e| line_parse_error(&String::from_utf8_lossy(bytes), e.to_string()))
+            }
+        }
+    }
+}
 
-        let delimiter = if self.schema.delimiter.len() == 1 {
-            Ok(self.schema.delimiter.chars().next().unwrap())
+// Read in place, so bytes, memoryviews and mmaps are parsed without a copy
+fn buffer_bytes(buffer: &PyBuffer<u8>) -> PyResult<&[u8]> {
+    if !buffer.is_c_contiguous() {
+        return Err(PyValueError::new_err("Buffer needs to be contiguous"));
+    }
+    // The bytes are read without the GIL, so nothing may write to them meanwhile
+    if !buffer.readonly() {
+        return Err(PyTypeError::new_err(
+            "Buffer needs to be read-only, eg: bytes or a read-only mmap",
+        ));
+    }
+    if buffer.len_bytes() == 0 {
+        return Ok(&[]);
+    }
+    Ok(unsafe { std::slice::from_raw_parts(buffer.buf_ptr() as *const u8, buffer.len_bytes()) })
+}
+
+fn single_byte(value: &str, name: &str) -> PyResult<u8> {
+    if value.len() == 1 {
+        Ok(value.as_bytes()[0])
+    } else {
+        Err(LineParseError::new_err(format!(
+            "{} must be a single byte",
+            name
+        )))
+    }
+}
+
+fn line_parse_error(line: &str, e: String) -> PyErr {
+    LineParseError::new_err(format!(
+        "Failed to parse line: '{}'\n {}",
+        line.trim_end_matches('\n'),
+        e,
+    ))
+}
+
+// Parsed rows hold no Python objects, so can be built without the GIL
+struct Row {
+    line_index: usize,
+    name: &'static PyObject,
+    values: Vec<Value>,
+}
+impl Row {
+    fn to_object<'a>(self, _py: Python<'a>, objects: &mut ObjectCache) -> PyResult<PyObject> {
+        let mut py_items: Vec<PyObject> = Vec::with_capacity(self.values.len() + 1);
+        py_items.push(self.name.clone_ref(_py));
+        for value in self.values {
+            py_items.push(value.to_object(_py, objects)?);
+        }
+        Ok(PyTuple::new(_py, py_items).into_py(_py))
+    }
+}
+
+#[derive(Clone)]
+enum Value {
+    None,
+    Str(String),
+    Member(&'static PyObject),
+    Int(i128),
+    Float(f64),
+    Decimal(Decimal),
+    Bool(bool),
+    Datetime(DateTime<Tz>),
+    Date(NaiveDate),
+    Time(NaiveTime),
+}
+// ASCII (which std checks a word at a time) can skip CPython's UTF-8 decoder
+// and be copied straight into a new 1 byte per char str
+fn str_to_py<'a>(_py: Python<'a>, value: &str) -> PyResult<PyObject> {
+    if !value.is_ascii() {
+        return Ok(value.into_py(_py));
+    }
+    unsafe {
+        let ptr = ffi::PyUnicode_New(value.len() as ffi::Py_ssize_t, 127);
+        // Raises the MemoryError if allocation failed
+        let obj = PyObject::from_owned_ptr_or_err(_py, ptr)?;
+        std::ptr::copy_nonoverlapping(
+            value.as_ptr(),
+            ffi::PyUnicode_DATA(ptr) as *mut u8,
+            value.len(),
+        );
+        Ok(obj)
+    }
+}
+
+impl Value {
+    fn to_object<'a>(self, _py: Python<'a>, objects: &mut ObjectCache) -> PyResult<PyObject> {
+        match self {
+            Value::Str(v) => str_to_py(_py, &v),
+            Value::Decimal(v) => Ok(objects.decimal(_py, v)),
+            Value::Datetime(v) => objects.datetime(_py, v),
+            _ => Ok(self.into_py(_py)),
+        }
+    }
+}
+impl IntoPy<PyObject> for Value {
+    fn into_py<'a>(self, _py: Python<'a>) -> PyObject {
+        match self {
+            Value::None => _py.None(),
+            Value::Str(v) => v.into_py(_py),
+            Value::Member(v) => v.clone_ref(_py),
+            Value::Int(v) => v.into_py(_py),
+            Value::Float(v) => v.into_py(_py),
+            Value::Decimal(v) => v.into_py(_py),
+            Value::Bool(v) => v.into_py(_py),
+            Value::Datetime(v) => v.into_py(_py),
+            Value::Date(v) => v.into_py(_py),
+            Value::Time(v) => v.into_py(_py),
+        }
+    }
+}
+
+// Direct mapped memo of parsed values keyed on (field, raw value), each batch
+// (or parallel chunk) has its own so there's no locking
+const VALUE_CACHE_SLOTS: usize = 1024;
+
+struct ValueCache {
+    slots: Vec<Option<(usize, String, Value)>>,
+}
+impl ValueCache {
+    fn new(enabled: bool) -> Self {
+        let n_slots = if enabled { VALUE_CACHE_SLOTS } else { 0 };
+        ValueCache {
+            slots: (0..n_slots).map(|_| None).collect(),
+        }
+    }
+    fn get_or_insert<F>(&mut self, field: &'static Field, raw: &str, f: F) -> Result<Value, String>
+    where
+        F: FnOnce() -> Result<Value, String>,
+    {
+        if self.slots.is_empty() || !field.is_cached() {
+            return f();
+        }
+        let key = field as *const Field as usize;
+        let hash = fnv1a(key as u64, raw.as_bytes());
+        let n_slots = self.slots.len();
+        let slot = &mut self.slots[hash as usize % n_slots];
+        if let Some((slot_key, slot_raw, value)) = slot {
+            if *slot_key == key && slot_raw == raw {
+                return Ok(value.clone());
+            }
+        }
+        let value = f()?;
+        *slot = Some((key, raw.to_string(), value.clone()));
+        Ok(value)
+    }
+}
+
+// Python objects that are slow to make, but being immutable can be shared
+// within a batch:
+// - Decimals are built by calling decimal.Decimal(str)
+// - Each datetime would otherwise get its own timedelta and timezone
+const DECIMAL_CACHE_SLOTS: usize = 64;
+
+struct ObjectCache {
+    // Keyed on the serialized form, 2.0 and 2.00 are == but print differently
+    decimals: Vec<Option<([u8; 16], PyObject)>>,
+    // UTC offset seconds -> tzinfo, there are only ever a few
+    tzinfos: Vec<(i32, PyObject)>,
+}
+impl ObjectCache {
+    fn new(cache_decimals: bool) -> Self {
+        let n_slots = if cache_decimals {
+            DECIMAL_CACHE_SLOTS
         } else {
-            Err(PyValueError::new_err("Delimiter needs to be of length 1"))
-        }?;
-        let mut out = String::new();
-        for ch in line.chars() {
-            if ch == delimiter {
-                break;
+            0
+        };
+        ObjectCache {
+            decimals: (0..n_slots).map(|_| None).collect(),
+            tzinfos: vec![],
+        }
+    }
+    fn datetime<'a>(&mut self, _py: Python<'a>, value: DateTime<Tz>) -> PyResult<PyObject> {
+        let offset = value.offset().fix();
+        let seconds = offset.local_minus_utc();
+        let tzinfo = match self.tzinfos.iter().find(|(s, _)| *s == seconds) {
+            Some((_, tzinfo)) => tzinfo.clone_ref(_py),
+            None => {
+                let tzinfo = offset.to_object(_py);
+                self.tzinfos.push((seconds, tzinfo.clone_ref(_py)));
+                tzinfo
+            }
+        };
+        let local = value.naive_local();
+        let datetime = PyDateTime::new(
+            _py,
+            local.year(),
+            local.month() as u8,
+            local.day() as u8,
+            local.hour() as u8,
+            local.minute() as u8,
+            local.second() as u8,
+            local.nanosecond() / 1000,
+            Some(tzinfo.as_ref(_py).downcast::<PyTzInfo>().unwrap()),
+        )?;
+        Ok(datetime.into_py(_py))
+    }
+    fn decimal<'a>(&mut self, _py: Python<'a>, value: Decimal) -> PyObject {
+        if self.decimals.is_empty() {
+            return value.into_py(_py);
+        }
+        let key = value.serialize();
+        let n_slots = self.decimals.len();
+        let slot = &mut self.decimals[fnv1a(0, &key) as usize % n_slots];
+        if let Some((slot_key, obj)) = slot {
+            if *slot_key == key {
+                return obj.clone_ref(_py);
             }
-            out.push(ch)
         }
-        return Ok(out.into_py(_py));
+        let obj = value.into_py(_py);
+        *slot = Some((key, obj.clone_ref(_py)));
+        obj
     }
 }
 
+fn fnv1a(seed: u64, bytes: &[u8]) -> u64 {
+    let mut hash: u64 = 0xcbf29ce484222325 ^ seed;
+    for b in bytes {
+        hash = (hash ^ *b as u64).wrapping_mul(0x100000001b3);
+    }
+    hash
+}
+
 struct Part {
     value: String,
     is_quoted: bool,
@@ -267,28 +954,41 @@ impl Part {
     }
 }
 
-fn split_line(line: &str, delimiter: char, quote_char: Option<char>) -> Vec<Part> {
+// Delimiter and quote are ASCII, so can't occur inside a multi-byte char,
+// memchr does the (SIMD) scanning
+fn split_line(line: &str, delimiter: u8, quote: Option<u8>) -> Vec<Part> {
+    let bytes = line.as_bytes();
     let mut parts_mut: Vec<Part> = vec![];
     let mut value = String::new();
     let mut in_quoted = false;
     let mut is_quoted = false;
-    for ch in line.chars() {
-        if quote_char.is_some() && ch == quote_char.unwrap() {
+    let mut start = 0;
+    loop {
+        let next = match quote {
+            Some(q) if in_quoted => memchr::memchr(q, &bytes[start..]),
+            Some(q) => memchr::memchr2(q, delimiter, &bytes[start..]),
+            None => memchr::memchr(delimiter, &bytes[start..]),
+        };
+        let i = match next {
+            Some(i) => start + i,
+            None => break,
+        };
+        value.push_str(&line[start..i]);
+        if Some(bytes[i]) == quote {
             in_quoted = !in_quoted;
             is_quoted = true;
-        } else if ch == delimiter && !in_quoted {
+        } else {
             parts_mut.push(Part {
-                value: value.clone(),
+                value: std::mem::take(&mut value),
                 is_quoted: is_quoted,
             });
-            value.clear();
             is_quoted = false;
-        } else {
-            value.push(ch);
-        };
+        }
+        start = i + 1;
     }
+    value.push_str(&line[start..]);
     parts_mut.push(Part {
-        value: value.clone(),
+        value: value,
         is_quoted: is_quoted,
     });
     parts_mut
@@ -309,88 +1009,207 @@ fn required(field: &Field) -> bool {
     }
 }
 
-fn part_to_py<'a>(
-    _py: Python<'a>,
+// We allow 'A' to pass as the enum '"A"', only enums pay for building the
+// quoted version
+fn with_quotes(value: &str, quote_char: Option<u8>) -> Option<String> {
+    quote_char.map(|q| {
+        let mut quoted = String::with_capacity(value.len() + 2);
+        quoted.push(q as char);
+        quoted.push_str(value);
+        quoted.push(q as char);
+        quoted
+    })
+}
+
+// Anything not exactly the fixed width shape (or odd values like leap
+// seconds) falls through to chrono
+fn parse_digits(b: &[u8]) -> Option<u32> {
+    b.iter().try_fold(0, |acc, &c| {
+        if c.is_ascii_digit() {
+            Some(acc * 10 + (c - b'0') as u32)
+        } else {
+            None
+        }
+    })
+}
+
+fn ymd(y: &[u8], m: &[u8], d: &[u8]) -> Option<NaiveDate> {
+    NaiveDate::from_ymd_opt(parse_digits(y)? as i32, parse_digits(m)?, parse_digits(d)?)
+}
+
+fn hms(h: &[u8], m: &[u8], s: &[u8]) -> Option<NaiveTime> {
+    NaiveTime::from_hms_opt(parse_digits(h)?, parse_digits(m)?, parse_digits(s)?)
+}
+
+fn fast_date(format: &Format, b: &[u8]) -> Option<NaiveDate> {
+    match format.fixed {
+        Some(FixedFormat::Date) if b.len() == 10 && b[4] == b'-' && b[7] == b'-' => {
+            ymd(&b[0..4], &b[5..7], &b[8..10])
+        }
+        Some(FixedFormat::DateCompact) if b.len() == 8 => ymd(&b[0..4], &b[4..6], &b[6..8]),
+        _ => None,
+    }
+}
+
+fn fast_time(format: &Format, b: &[u8]) -> Option<NaiveTime> {
+    match format.fixed {
+        Some(FixedFormat::Time) if b.len() == 8 && b[2] == b':' && b[5] == b':' => {
+            hms(&b[0..2], &b[3..5], &b[6..8])
+        }
+        Some(FixedFormat::TimeCompact) if b.len() == 6 => hms(&b[0..2], &b[2..4], &b[4..6]),
+        _ => None,
+    }
+}
+
+fn fast_datetime(format: &Format, b: &[u8]) -> Option<NaiveDateTime> {
+    match format.fixed {
+        Some(FixedFormat::Datetime(sep))
+            if b.len() == 19
+                && b[4] == b'-'
+                && b[7] == b'-'
+                && b[10] == sep
+                && b[13] == b':'
+                && b[16] == b':' =>
+        {
+            let date = ymd(&b[0..4], &b[5..7], &b[8..10])?;
+            Some(date.and_time(hms(&b[11..13], &b[14..16], &b[17..19])?))
+        }
+        _ => None,
+    }
+}
+
+// Eight ASCII digits at once (SWAR), shorter input is left padded with '0's
+fn parse_8_digits(b: &[u8]) -> Option<u64> {
+    let mut word = [b'0'; 8];
+    word[8 - b.len()..].copy_from_slice(b);
+    let v = u64::from_le_bytes(word);
+    // Every byte is 0x30..=0x39
+    if v & 0xF0F0F0F0F0F0F0F0 != 0x3030303030303030
+        || v.wrapping_add(0x0606060606060606) & 0xF0F0F0F0F0F0F0F0 != 0x3030303030303030
+    {
+        return None;
+    }
+    let v = v & 0x0F0F0F0F0F0F0F0F;
+    let v = v.wrapping_mul(2561) >> 8;
+    let v = (v & 0x00FF00FF00FF00FF).wrapping_mul(6553601) >> 16;
+    Some((v & 0x0000FFFF0000FFFF).wrapping_mul(42949672960001) >> 32)
+}
+
+// Up to 16 digits with an optional sign, anything else falls through to the
+// std parser
+fn fast_int(value: &str) -> Option<i128> {
+    let b = value.as_bytes();
+    let (negative, digits) = match b.first() {
+        Some(b'-') => (true, &b[1..]),
+        Some(b'+') => (false, &b[1..]),
+        _ => (false, b),
+    };
+    let i = match digits.len() {
+        0 => return None,
+        1..=8 => parse_8_digits(digits)?,
+        9..=16 => {
+            let (hi, lo) = digits.split_at(digits.len() - 8);
+            parse_8_digits(hi)? * 100_000_000 + parse_8_digits(lo)?
+        }
+        _ => return None,
+    } as i128;
+    Some(if negative { -i } else { i })
+}
+
+fn part_to_value(
     coerce_empty_quoted: bool,
-    quote_char: Option<char>,
-    schema_field: &Field,
+    quote_char: Option<u8>,
+    schema_field: &'static Field,
     part: &Part,
-) -> PyResult<PyObject> {
+) -> Result<Value, String> {
     let err = |extra: &str| {
-        Err(PyValueError::new_err(format!(
+        Err(format!(
             "{} - '{}' given schema: {:?}",
             extra, part.value, schema_field,
-        )))
+        ))
     };
     // Return None for empty values
-    let none: Option<&str> = None;
     let coerce = coerce_empty_quoted && schema_field.is_str() && part.is_quoted;
     if part.value == "" && !required(schema_field) && !coerce {
-        return Ok(none.into_py(_py));
+        return Ok(Value::None);
     }
-    // Later, we allow 'A' to pass as the enum or bool '"A"'
-    let mut part_with_quotes = part.value.clone();
-    quote_char.map(|q| {
-        part_with_quotes.clear();
-        part_with_quotes.push(q);
-        part_with_quotes.push_str(part.as_str());
-        part_with_quotes.push(q);
-    });
     match schema_field {
         Field::Str(StrField {
-            min_length,
-            max_length,
             invalid_characters,
+            length_range,
             ..
         }) => {
-            if min_length.is_some() && part.value.len() < min_length.unwrap() {
-                return err("String is too short");
-            }
-            if max_length.is_some() && part.value.len() > max_length.unwrap() {
-                return err("String is too long");
+            if let Some((min, span)) = *length_range {
+                let length = part.value.len();
+                if length.wrapping_sub(min) > span {
+                    return err(if length < min {
+                        "String is too short"
+                    } else {
+                        "String is too long"
+                    });
+                }
             }
             if let Some(invalid_characters_) = invalid_characters {
-                if part.value.chars().any(|c| invalid_characters_.contains(c)) {
+                if invalid_characters_.contains_any(part.as_str()) {
                     return err("String contains invalid characters");
                 }
             }
-            Ok(part.value.clone().into_py(_py))
+            Ok(Value::Str(part.value.clone()))
         }
-        Field::StrEnum(StrEnumField { values, .. }) => {
-            if values.contains(&part.value) {
-                Ok(part.value.clone().into_py(_py))
-            } else if values.contains(&part_with_quotes) {
-                Ok(part_with_quotes.clone().into_py(_py))
-            } else {
-                err("Value not in enum")
+        Field::StrEnum(StrEnumField {
+            values, members, ..
+        }) => {
+            let i = values.binary_search(&part.value).or_else(|_| {
+                with_quotes(part.as_str(), quote_char)
+                    .map_or(Err(0), |quoted| values.binary_search(&quoted))
+            });
+            match i {
+                Ok(i) => Ok(Value::Member(&members[i])),
+                Err(_) => err("Value not in enum"),
             }
         }
         Field::Int(IntField {
             min_value,
             max_value,
             ..
-        }) => part.value.parse::<i128>().map_or_else(
-            |_| err("Does not parse as int"),
-            |i| {
-                if min_value.is_some() && i < (min_value.unwrap() as i128) {
-                    return err("Int is too small");
-                }
-                if max_value.is_some() && i > (max_value.unwrap() as i128) {
-                    return err("Int is too large");
-                }
-                Ok(i.into_py(_py))
-            },
-        ),
-        Field::IntEnum(IntEnumField { values, .. }) => part.value.parse::<i64>().map_or_else(
-            |_| err("Does not parse as int"),
-            |i| {
-                if values.contains(&i) {
-                    Ok(i.into_py(_py))
-                } else {
-                    err("Value not in enum")
-                }
-            },
-        ),
+        }) => fast_int(part.as_str())
+            .map_or_else(|| part.value.parse::<i128>(), Ok)
+            .map_or_else(
+                |_| err("Does not parse as int"),
+                |i| {
+                    if min_value.is_some() && i < (min_value.unwrap() as i128) {
+                        return err("Int is too small");
+                    }
+                    if max_value.is_some() && i > (max_value.unwrap() as i128) {
+                        return err("Int is too large");
+                    }
+                    Ok(Value::Int(i))
+                },
+            ),
+        Field::IntEnum(IntEnumField {
+            values,
+            members,
+            contiguous_lo,
+            ..
+        }) => fast_int(part.as_str())
+            .map(|i| i as i64)
+            .map_or_else(|| part.value.parse::<i64>(), Ok)
+            .map_or_else(
+                |_| err("Does not parse as int"),
+                |i| {
+                    let j = match *contiguous_lo {
+                        Some(lo) => match i.checked_sub(lo) {
+                            Some(k) if 0 <= k && k < values.len() as i64 => Ok(k as usize),
+                            _ => Err(0),
+                        },
+                        None => values.binary_search(&i),
+                    };
+                    match j {
+                        Ok(j) => Ok(Value::Member(&members[j])),
+                        Err(_) => err("Value not in enum"),
+                    }
+                },
+            ),
         Field::Float(FloatField {
             min_value,
             max_value,
@@ -404,7 +1223,7 @@ fn part_to_py<'a>(
                 if max_value.is_some() && i > max_value.unwrap() {
                     return err("Float is too large");
                 }
-                Ok(i.into_py(_py))
+                Ok(Value::Float(i))
             },
         ),
         Field::Decimal(DecimalField {
@@ -422,9 +1241,9 @@ fn part_to_py<'a>(
                     return err("Decimal is too large");
                 }
                 if round_decimal_places.is_some() {
-                    return Ok(i.round_dp(round_decimal_places.unwrap()).into_py(_py));
+                    return Ok(Value::Decimal(i.round_dp(round_decimal_places.unwrap())));
                 }
-                Ok(i.into_py(_py))
+                Ok(Value::Decimal(i))
             },
         ),
         Field::Bool(BoolField {
@@ -432,12 +1251,12 @@ fn part_to_py<'a>(
             false_value,
             ..
         }) => {
-            if &part.value == true_value || &part_with_quotes == true_value {
-                Ok(true.into_py(_py))
+            if true_value.matches(part.as_str(), quote_char) {
+                Ok(Value::Bool(true))
             } else if false_value.as_ref().map_or(false, |false_value_| {
-                &part.value == false_value_ || &part_with_quotes == false_value_
+                false_value_.matches(part.as_str(), quote_char)
             }) {
-                Ok(false.into_py(_py))
+                Ok(Value::Bool(false))
             } else {
                 err("Value is neither true or false value")
             }
@@ -445,38 +1264,45 @@ fn part_to_py<'a>(
         Field::Datetime(DatetimeField {
             format, time_zone, ..
         }) => {
-            let tz: Result<Tz, _> = time_zone.parse();
-            if tz.is_err() {
-                return err("Invalid timezone");
-            }
-            NaiveDateTime::parse_from_str(part.as_str(), format).map_or_else(
-                |_| err("Does not parse as datetime"),
-                |i| {
-                    let dt = tz.unwrap().with_ymd_and_hms(
-                        i.year(),
-                        i.month(),
-                        i.day(),
-                        i.hour(),
-                        i.minute(),
-                        i.second(),
-                    );
-                    match dt {
-                        LocalResult::Single(dt) => Ok(dt.into_py(_py)),
-                        _ => err("Does not parse as datetime"),
-                    }
-                },
-            )
+            let tz = match time_zone.tz {
+                Some(tz) => tz,
+                None => return err("Invalid timezone"),
+            };
+            fast_datetime(format, part.value.as_bytes())
+                .map_or_else(
+                    || NaiveDateTime::parse_from_str(part.as_str(), &format.raw),
+                    Ok,
+                )
+                .map_or_else(
+                    |_| err("Does not parse as datetime"),
+                    |i| {
+                        let dt = tz.with_ymd_and_hms(
+                            i.year(),
+                            i.month(),
+                            i.day(),
+                            i.hour(),
+                            i.minute(),
+                            i.second(),
+                        );
+                        match dt {
+                            LocalResult::Single(dt) => Ok(Value::Datetime(dt)),
+                            _ => err("Does not parse as datetime"),
+                        }
+                    },
+                )
         }
-        Field::Date(DateField { format, .. }) => NaiveDate::parse_from_str(part.as_str(), format)
-            .map_or_else(|_| err("Does not parse as date"), |i| Ok(i.into_py(_py))),
+        Field::Date(DateField { format, .. }) => fast_date(format, part.value.as_bytes())
+            .map_or_else(|| NaiveDate::parse_from_str(part.as_str(), &format.raw), Ok)
+            .map_or_else(|_| err("Does not parse as date"), |i| Ok(Value::Date(i))),
         Field::Time(TimeField { format, .. }) => {
             let part_24_to_00 = if part.value == "240000" {
                 "000000"
             } else {
                 part.as_str()
             }; // I kno rite
-            NaiveTime::parse_from_str(part_24_to_00, format)
-                .map_or_else(|_| err("Does not parse as time"), |i| Ok(i.into_py(_py)))
+            fast_time(format, part_24_to_00.as_bytes())
+                .map_or_else(|| NaiveTime::parse_from_str(part_24_to_00, &format.raw), Ok)
+                .map_or_else(|_| err("Does not parse as time"), |i| Ok(Value::Time(i)))
         }
     }
 }
@@ -485,5 +1311,6 @@ fn part_to_py<'a>(
 #[pyo3(name = "xlineparse")]
 fn init_mod(_py: Python, m: &PyModule) -> PyResult<()> {
     m.add_class::<Parser>()?;
+    m.add("LineParseError", _py.get_type::<LineParseError>())?;
     Ok(())
 }
@@ -1,6 +1,12 @@
+from concurrent.futures import ThreadPoolExecutor
+import dataclasses
 import datetime as dt
 from decimal import Decimal
 import enum
+import functools
+import io
+import os
+from pathlib import Path
 from typing import Annotated, Any, Literal
 import zoneinfo
 
@@ -44,15 +50,24 @@ class WeirdQuotedEnum(enum.Enum):
     B = '"B"'
 
 
+class OtherFooEnum(enum.Enum):
+    A = "A"
+    B = "B"
+
+
 class BarEnum(enum.Enum):
     ONE = 1
     TWO = 2
 
 
+class SparseBarEnum(enum.Enum):
+    ONE = 1
+    TEN = 10
+
+
 def test_parse_types() -> None:
-    assert schema_many_types.parse_line(
-        "asd|1|3.14||Y|2012-01-02|123200|2014-07-28 12:00:09|2014-07-28 12:00:09"
-    ) == (
+    line = "asd|1|3.14||Y|2012-01-02|123200|2014-07-28 12:00:09|2014-07-28 12:00:09"
+    expected = (
         "asd",
         1,
         Decimal("3.14"),
@@ -63,6 +78,16 @@ def test_parse_types() -> None:
         dt.datetime(2014, 7, 28, 12, 0, 9, tzinfo=dt.timezone.utc),
         dt.datetime(2014, 7, 28, 12, 0, 9, tzinfo=zoneinfo.ZoneInfo("Europe/London")),
     )
+    assert schema_many_types.parse_line(line) == expected
+    assert schema_many_types.parse_line(line.encode()) == expected
+    assert schema_many_types.parse_line(memoryview(line.encode())) == expected
+    assert schema_many_types.parse_buffer(f"{line}\n{line}\n".encode()) == [
+        expected,
+        expected,
+    ]
+    assert list(schema_many_types.parse_lines(io.StringIO(f"{line}\n" * 3))) == [
+        expected
+    ] * 3
 
 
 def test_parse_either_line() -> None:
@@ -73,6 +98,8 @@ def test_parse_either_line() -> None:
         "qwe",
         1,
     )
+    with pytest.raises(xlp.LineParseError, match="No schema line matching 'zxc'"):
+        xlp.Schema.from_type(delimiter="|", t=AsdLine | QweLine).parse_line("zxc|1")
 
 
 def test_parse_trailing() -> None:
@@ -135,6 +162,14 @@ def test_parse_int_enum() -> None:
         "bar",
         BarEnum.TWO,
     )
+    schema = xlp.Schema.from_type(
+        delimiter="|",
+        t=tuple[Literal["bar"], BarEnum, SparseBarEnum],
+    )
+    assert schema.parse_line("bar|1|10") == ("bar", BarEnum.ONE, SparseBarEnum.TEN)
+    for line in ["bar|0|1", "bar|3|1", "bar|1|2"]:
+        with pytest.raises(xlp.LineParseError, match="Value not in enum"):
+            schema.parse_line(line)
 
 
 def test_parse_quoted() -> None:
@@ -185,6 +220,16 @@ def test_parse_quoted_with_comma() -> None:
         "oi, oi",
         4,
     )
+    assert xlp.Schema.from_type(
+        delimiter=",",
+        quote_str='"',
+        t=tuple[Literal["zxc"], str, str, int],
+    ).parse_line('"zxc","ö, ä",é,4') == (
+        "zxc",
+        "ö, ä",
+        "é",
+        4,
+    )
 
 
 def test_emptyness() -> None:
@@ -221,6 +266,7 @@ def test_emptyness() -> None:
     ).parse_line('"a",""') == ("a", "")
 
 
+@functools.lru_cache(maxsize=None)
 def _simple_schema(t: Any) -> xlp.Schema:
     return xlp.Schema.from_type(
         delimiter="|",
@@ -237,6 +283,16 @@ def test_str_constraints() -> None:
     with pytest.raises(xlp.LineParseError):
         _simple_schema(Annotated[str, xlp.StrField(max_length=2)]).parse_line("a|hii")
 
+    between = _simple_schema(Annotated[str, xlp.StrField(min_length=2, max_length=3)])
+    for line in ["a|hi", "a|hii"]:
+        between.parse_line(line)
+    with pytest.raises(xlp.LineParseError, match="String is too short"):
+        between.parse_line("a|h")
+    with pytest.raises(xlp.LineParseError, match="String is too long"):
+        between.parse_line("a|hiii")
+    with pytest.raises(xlp.LineParseError, match="greater than max_length"):
+        _simple_schema(Annotated[str, xlp.StrField(min_length=3, max_length=2)])
+
     _simple_schema(Annotated[str, xlp.StrField(invalid_characters="abc")]).parse_line(
         "a|def"
     )
@@ -244,6 +300,11 @@ def test_str_constraints() -> None:
         _simple_schema(
             Annotated[str, xlp.StrField(invalid_characters="abc")]
         ).parse_line("a|decf")
+    non_ascii = _simple_schema(Annotated[str, xlp.StrField(invalid_characters="é~")])
+    non_ascii.parse_line("a|aè")
+    for line in ["a|aé", "a|~"]:
+        with pytest.raises(xlp.LineParseError, match="invalid characters"):
+            non_ascii.parse_line(line)
 
 
 def test_int_constraints() -> None:
@@ -297,39 +358,72 @@ def test_decimal_rounding() -> None:
     ).parse_line("a|2.00001") == ("a", Decimal("2.000"))
 
 
-def test_errors() -> None:
-    xlp.Schema.from_type(
+@pytest.mark.parametrize("cache_values", [True, False])
+def test_parse_many_repeated_values(cache_values: bool) -> None:
+    schema = xlp.Schema.from_type(
         delimiter="|",
-        t=tuple[Literal["a"], int],
-    ).parse_line("a|1")
+        cache_values=cache_values,
+        t=tuple[
+            Literal["a"],
+            Annotated[dt.date, xlp.DateField(format="%Y-%m-%d")],
+            Annotated[Decimal | None, xlp.DecimalField(round_decimal_places=1)],
+        ],
+    )
+    lines = ["a|2012-01-02|2.01", "a|2012-01-03|2.04", "a|2012-01-02|"] * 500
+    assert schema.parse_many(lines) == [
+        ("a", dt.date(2012, 1, 2), Decimal("2.0")),
+        ("a", dt.date(2012, 1, 3), Decimal("2.0")),
+        ("a", dt.date(2012, 1, 2), None),
+    ] * 500
+    with pytest.raises(xlp.LineParseError, match="Does not parse as date"):
+        schema.parse_many([*lines, "a|2012-13-02|2.01"])
 
-    with pytest.raises(xlp.LineParseError):
+
+def test_parse_many_decimals() -> None:
+    schema = _simple_schema(Decimal)
+    rows = schema.parse_many(["a|2.0", "a|2.00", "a|-2.0", "a|2", "a|2.0"])
+    assert [str(v) for _, v in rows] == ["2.0", "2.00", "-2.0", "2", "2.0"]
+
+
+schema_a_int = xlp.Schema.from_type(
+    delimiter="|",
+    t=tuple[Literal["a"], int],
+)
+schema_a_int_trailing = xlp.Schema.from_type(
+    delimiter="|",
+    trailing_delimiter=True,
+    t=tuple[Literal["a"], int],
+)
+
+
+def test_errors() -> None:
+    schema_a_int.parse_line("a|1")
+
+    # Checked when the schema is built
+    with pytest.raises(xlp.LineParseError, match="Delimiter must be a single byte"):
         xlp.Schema.from_type(
             delimiter="||",  # too long
             t=tuple[Literal["a"], int],
-        ).parse_line("a|1")
+        )
 
-    with pytest.raises(xlp.LineParseError):
+    with pytest.raises(xlp.LineParseError, match="Delimiter must be a single byte"):
         xlp.Schema.from_type(
-            delimiter="|",
-            quote_str='""',  # too long
+            delimiter="¦",  # not a single byte
             t=tuple[Literal["a"], int],
-        ).parse_line("a|1")
+        )
 
-    with pytest.raises(xlp.LineParseError):
+    with pytest.raises(xlp.LineParseError, match="Quote must be a single byte"):
         xlp.Schema.from_type(
             delimiter="|",
-            trailing_delimiter=True,  # no trailing
+            quote_str='""',  # too long
             t=tuple[Literal["a"], int],
-        ).parse_line("a|1")
+        )
 
     with pytest.raises(xlp.LineParseError):
-        xlp.Schema.from_type(
-            delimiter="|",
-            t=tuple[Literal["a"], int],
-        ).parse_line(
-            "a|1|2"
-        )  # too many parts
+        schema_a_int_trailing.parse_line("a|1")  # no trailing
+
+    with pytest.raises(xlp.LineParseError):
+        schema_a_int.parse_line("a|1|2")  # too many parts
 
 
 def test_low_level_usage() -> None:
@@ -385,27 +479,320 @@ def test_weird_time() -> None:
     assert schema.parse_line("a|240000") == ("a", dt.time(0, 0, 0))
 
 
+schema_a_str = xlp.Schema.from_type(
+    delimiter="|",
+    t=tuple[Literal["a"], str | None],
+)
+schema_a_str_quoted = xlp.Schema.from_type(
+    delimiter=",",
+    quote_str='"',
+    t=tuple[Literal["a"], str | None],
+)
+
+
 def test_parse_first() -> None:
-    assert (
-        xlp.Schema.from_type(
+    assert schema_a_str.parse_first("abc|bkaaadfsd|sdfsdf") == "abc"
+    assert schema_a_str_quoted.parse_first('"abc"...bkaaadfsd') == "abc"
+    assert schema_a_str_quoted.parse_first("abc,...bkaaadfsd") == "abc"
+    assert schema_a_str.parse_first(b"abc|bkaaadfsd|sdfsdf") == "abc"
+    assert schema_a_str.parse_first("abc") == "abc"
+    assert schema_a_str_quoted.parse_first('"abc') == "abc"
+
+
+def test_from_type_is_cached() -> None:
+    assert xlp.Schema.from_type(delimiter="|", t=QweLine) is xlp.Schema.from_type(
+        delimiter="|", t=QweLine
+    )
+    assert xlp.Schema.from_type(delimiter="|", t=QweLine) is not (
+        xlp.Schema.from_type(delimiter=",", t=QweLine)
+    )
+    # Shared, so can't be changed
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        xlp.Schema.from_type(delimiter="|", t=QweLine).delimiter = ","  # type: ignore
+    # Unions compare equal whatever the order, but the first line of a name wins
+    int_first = xlp.Schema.from_type(
+        delimiter="|", t=tuple[Literal["a"], int] | tuple[Literal["a"], str]
+    )
+    str_first = xlp.Schema.from_type(
+        delimiter="|", t=tuple[Literal["a"], str] | tuple[Literal["a"], int]
+    )
+    assert int_first.parse_line("a|1") == ("a", 1)
+    assert str_first.parse_line("a|1") == ("a", "1")
+
+
+def test_parse_many() -> None:
+    schema = xlp.Schema.from_type(
+        delimiter="|",
+        t=tuple[Literal["foo"], int, FooEnum | None] | QweLine,
+    )
+    lines = ["foo|1|A", "qwe|2", "foo|3|"] * 1000
+    assert schema.parse_many(lines) == [
+        ("foo", 1, FooEnum.A),
+        ("qwe", 2),
+        ("foo", 3, None),
+    ] * 1000
+    assert schema.parse_many([]) == []
+
+    with pytest.raises(
+        xlp.LineParseError, match=r"Failed to parse line: 'qwe\|x'"
+    ):
+        schema.parse_many(["qwe|1", "qwe|x\n"])
+
+
+def test_parser_is_shared() -> None:
+    def schema() -> xlp.Schema:
+        return xlp.Schema(
             delimiter="|",
-            t=tuple[Literal["a"], str | None],
-        ).parse_first("abc|bkaaadfsd|sdfsdf")
-        == "abc"
+            lines=[xlp.Line(name="a", fields=[xlp.IntField()])],
+        )
+
+    assert schema()._parser is schema()._parser
+    assert xlp.Schema(
+        delimiter="|",
+        lines=[xlp.Line(name="a", fields=[xlp.FloatField()])],
+    ).parse_line("a|1") == ("a", 1.0)
+    assert _simple_schema(FooEnum).parse_line("a|A") == ("a", FooEnum.A)
+    assert _simple_schema(OtherFooEnum).parse_line("a|A") == ("a", OtherFooEnum.A)
+
+
+def test_lines_are_tuples() -> None:
+    schema = xlp.Schema(
+        delimiter="|",
+        lines=[xlp.Line(name="a", fields=[xlp.IntField()])],
     )
-    assert (
-        xlp.Schema.from_type(
-            delimiter=",",
-            quote_str='"',
-            t=tuple[Literal["a"], str | None],
-        ).parse_first('"abc"...bkaaadfsd')
-        == "abc"
+    assert schema.lines == (xlp.Line(name="a", fields=(xlp.IntField(),)),)
+    assert isinstance(schema.lines, tuple)
+    assert isinstance(schema.lines[0].fields, tuple)
+
+
+def test_fields_compare_by_class() -> None:
+    int_field = xlp.field_type_to_field(Annotated[float, xlp.IntField(min_value=1)])
+    float_field = xlp.field_type_to_field(
+        Annotated[float, xlp.FloatField(min_value=1)]
     )
-    assert (
-        xlp.Schema.from_type(
-            delimiter=",",
-            quote_str='"',
-            t=tuple[Literal["a"], str | None],
-        ).parse_first("abc,...bkaaadfsd")
-        == "abc"
+    assert int_field != float_field
+    assert type(int_field) is xlp.IntField
+    assert type(float_field) is xlp.FloatField
+    assert dataclasses.replace(float_field, required=False) == xlp.FloatField(
+        required=False, min_value=1
     )
+
+
+def test_field_subclass() -> None:
+    @dataclasses.dataclass(frozen=True, kw_only=True, slots=True)
+    class PositiveIntField(xlp.IntField):
+        min_value: int | None = 1
+
+    schema = _simple_schema(Annotated[int, PositiveIntField()])
+    assert schema.parse_line("a|1") == ("a", 1)
+    with pytest.raises(xlp.LineParseError, match="Int is too small"):
+        schema.parse_line("a|0")
+    with pytest.raises(TypeError, match="Unsupported field type: object"):
+        xlp.Schema(
+            delimiter="|",
+            lines=[xlp.Line(name="a", fields=[object()])],  # type: ignore[list-item]
+        )
+
+
+def test_schema_subclass() -> None:
+    class UpperSchema(xlp.Schema):
+        def parse_line(self, line: str | bytes) -> tuple[Any, ...]:
+            return tuple(v.upper() for v in super().parse_line(line))
+
+    schema = UpperSchema(
+        delimiter="|",
+        lines=[xlp.Line(name="a", fields=[xlp.StrField()])],
+    )
+    assert schema.parse_line("a|b") == ("A", "B")
+    assert schema.parse_many(["a|b"]) == [("a", "b")]
+
+
+def test_error_message() -> None:
+    with pytest.raises(xlp.LineParseError) as exc_info:
+        _simple_schema(int).parse_line("a|x\n")
+    assert isinstance(exc_info.value, ValueError)
+    assert str(exc_info.value).startswith("Failed to parse line: 'a|x'\n ")
+    with pytest.raises(xlp.LineParseError) as exc_info:
+        _simple_schema(FooEnum).parse_line("a|C")
+    assert str(exc_info.value).endswith(
+        "StrEnum(StrEnumField { required: true, values: [\"A\", \"B\"] })"
+    )
+    with pytest.raises(xlp.LineParseError) as exc_info:
+        _simple_schema(BarEnum).parse_line("a|3")
+    assert str(exc_info.value).endswith(
+        "IntEnum(IntEnumField { required: true, values: [1, 2] })"
+    )
+
+
+def test_parse_many_threaded() -> None:
+    lines = [
+        "asd|1|3.14||Y|2012-01-02|123200|2014-07-28 12:00:09|2014-07-28 12:00:09"
+    ] * 1000
+    expected = schema_many_types.parse_many(lines)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(schema_many_types.parse_many, [lines] * 8))
+    assert results == [expected] * 8
+
+
+def test_parse_buffer() -> None:
+    schema = xlp.Schema.from_type(delimiter="|", t=QweLine)
+    assert schema.parse_buffer(b"") == []
+    assert schema.parse_buffer(b"qwe|1") == [("qwe", 1)]
+    assert schema.parse_buffer(b"qwe|1\nqwe|2\n") == [("qwe", 1), ("qwe", 2)]
+    assert schema.parse_buffer(b"qwe|1;qwe|2", newline=b";") == [
+        ("qwe", 1),
+        ("qwe", 2),
+    ]
+    with pytest.raises(xlp.LineParseError, match="Failed to parse line: 'qwe'"):
+        schema.parse_buffer(b"qwe|1\nqwe\n")
+    with pytest.raises(xlp.LineParseError, match="Newline must be a single byte"):
+        schema.parse_buffer(b"qwe|1\r\n", newline=b"\r\n")
+    assert schema.parse_buffer(memoryview(b"qwe|1")) == [("qwe", 1)]
+    # Parsed without the GIL, so mutable buffers are refused
+    with pytest.raises(TypeError, match="Buffer needs to be read-only"):
+        schema.parse_buffer(bytearray(b"qwe|1"))
+    with pytest.raises(TypeError, match="Buffer needs to be read-only"):
+        schema.parse_line(bytearray(b"qwe|1"))
+
+
+def test_parse_file(tmp_path: Path) -> None:
+    schema = xlp.Schema.from_type(delimiter="|", t=QweLine)
+    path = tmp_path / "qwe.txt"
+    path.write_bytes(b"")
+    assert schema.parse_file(path) == []
+    path.write_bytes(b"".join(b"qwe|%d\n" % i for i in range(10_000)))
+    expected = [("qwe", i) for i in range(10_000)]
+    assert schema.parse_file(path) == expected
+    assert schema.parse_file(path, parallel=True) == expected
+    assert schema.parse_file(path, parallel=True, num_threads=3) == expected
+    assert schema.parse_buffer(path.read_bytes(), parallel=True) == expected
+    path.write_bytes(b"qwe|1\n" * 10_000 + b"qwe|x\n")
+    with pytest.raises(xlp.LineParseError, match=r"Failed to parse line: 'qwe\|x'"):
+        schema.parse_file(path, parallel=True)
+
+
+@pytest.mark.skipif(not hasattr(os, "mkfifo"), reason="needs named pipes")
+def test_parse_file_pipe(tmp_path: Path) -> None:
+    schema = xlp.Schema.from_type(delimiter="|", t=QweLine)
+    path = tmp_path / "qwe.fifo"
+    os.mkfifo(path)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        executor.submit(path.write_bytes, b"qwe|1\nqwe|2\n")
+        assert schema.parse_file(path) == [("qwe", 1), ("qwe", 2)]
+
+
+def test_parse_datetime_formats() -> None:
+    schema = xlp.Schema.from_type(
+        delimiter="|",
+        t=tuple[
+            Literal["a"],
+            Annotated[
+                dt.datetime,
+                xlp.DatetimeField(format="%Y-%m-%d %H:%M:%S", time_zone="UTC"),
+            ],
+            Annotated[dt.date, xlp.DateField(format="%Y-%m-%d")],
+            Annotated[dt.time, xlp.TimeField(format="%H:%M:%S")],
+        ],
+    )
+    assert schema.parse_line("a|2014-07-28 12:00:09|2014-07-28|12:00:09") == (
+        "a",
+        dt.datetime(2014, 7, 28, 12, 0, 9, tzinfo=dt.timezone.utc),
+        dt.date(2014, 7, 28),
+        dt.time(12, 0, 9),
+    )
+    # Not zero padded, parsed by the general path
+    assert schema.parse_line("a|2014-7-28 12:00:09|2014-7-28|1:00:09") == (
+        "a",
+        dt.datetime(2014, 7, 28, 12, 0, 9, tzinfo=dt.timezone.utc),
+        dt.date(2014, 7, 28),
+        dt.time(1, 0, 9),
+    )
+    with pytest.raises(xlp.LineParseError, match="Does not parse as date"):
+        schema.parse_line("a|2014-07-28 12:00:09|2014-02-30|12:00:09")
+
+
+def test_parse_line_bytes() -> None:
+    assert schema_a_str.parse_line("a|é".encode()) == ("a", "é")
+    # Long enough that the GIL is released
+    assert schema_a_str.parse_line(b"a|" + b"x" * 10_000) == ("a", "x" * 10_000)
+    with pytest.raises(xlp.LineParseError, match="invalid utf-8"):
+        schema_a_str.parse_line(b"a|\xff")
+
+
+def test_parse_columns() -> None:
+    schema = xlp.Schema.from_type(
+        delimiter="|",
+        t=tuple[Literal["foo"], int, FooEnum | None] | QweLine | AsdLine,
+    )
+    data = b"foo|1|A\nqwe|2\nfoo|3|\n"
+    assert schema.parse_columns(data) == {
+        "foo": ([1, 3], [FooEnum.A, None]),
+        "qwe": ([2],),
+        "asd": ([], [], [], [], [], [], [], []),
+    }
+    assert schema.parse_columns(data * 1000, parallel=True)["foo"] == (
+        [1, 3] * 1000,
+        [FooEnum.A, None] * 1000,
+    )
+
+
+def test_parse_datetime_time_zones() -> None:
+    schema = xlp.Schema.from_type(
+        delimiter="|",
+        t=tuple[
+            Literal["a"],
+            Annotated[
+                dt.datetime,
+                xlp.DatetimeField(
+                    format="%Y-%m-%d %H:%M:%S", time_zone="Europe/London"
+                ),
+            ],
+        ],
+    )
+    (_, summer), (_, winter), (_, summer_again) = schema.parse_many(
+        ["a|2014-07-28 12:00:09", "a|2014-01-28 12:00:09", "a|2014-07-29 12:00:09"]
+    )
+    assert summer.utcoffset() == dt.timedelta(hours=1)
+    assert winter.utcoffset() == dt.timedelta(0)
+    assert summer_again.utcoffset() == dt.timedelta(hours=1)
+
+    bad = xlp.Schema.from_type(
+        delimiter="|",
+        t=tuple[
+            Literal["a"],
+            Annotated[
+                dt.datetime,
+                xlp.DatetimeField(format="%Y-%m-%d %H:%M:%S", time_zone="Mars/Base"),
+            ],
+        ],
+    )
+    with pytest.raises(xlp.LineParseError, match="Invalid timezone"):
+        bad.parse_line("a|2014-07-28 12:00:09")
+
+
+def test_parse_ints() -> None:
+    schema = _simple_schema(int)
+    for value in [0, 7, -7, 12345678, 123456789, -9999999999999999, 10**20, -(10**20)]:
+        assert schema.parse_line(f"a|{value}") == ("a", value)
+    assert schema.parse_line("a|+5") == ("a", 5)
+    assert schema.parse_line("a|007") == ("a", 7)
+    for line in ["a|1a", "a|-", "a|1.0", "a| 1"]:
+        with pytest.raises(xlp.LineParseError, match="Does not parse as int"):
+            schema.parse_line(line)
+
+
+def test_parse_bools() -> None:
+    schema = _simple_schema(
+        Annotated[bool, xlp.BoolField(true_value="Yes", false_value="Nope, not at all")]
+    )
+    assert schema.parse_line("a|Yes") == ("a", True)
+    assert schema.parse_line("a|Nope, not at all") == ("a", False)
+    for line in ["a|Ye", "a|Yess", "a|Nope, not at al", "a|"]:
+        with pytest.raises(xlp.LineParseError, match="neither true or false"):
+            schema.parse_line(line)
+
+
+def test_parse_strs() -> None:
+    schema = xlp.Schema.from_type(delimiter="|", t=tuple[Literal["a"], str, str, str])
+    assert schema.parse_line("a|hello||ünïcode") == ("a", "hello", "", "ünïcode")
+    assert schema.parse_line("a|x|\x7f|🙂") == ("a", "x", "\x7f", "🙂")